@@ -90,6 +90,8 @@ if errorlevel 1 (
   pause
   exit /b 1
 )
+REM optional: faster file hashing for dedupe (falls back to SHA1 if missing)
+python -m pip install blake3 >nul 2>nul
 
 REM --- icon conversion
 echo [INFO] Converting icon.png to icon.ico...
@@ -1,18 +1,36 @@
 import os
+import re
+import math
+import sys
 import time
 import threading
 import queue
+import collections
+import concurrent.futures
 import hashlib
+import mmap
 import shutil
 import logging
+import logging.handlers
+import functools
+import ctypes
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+try:
+    import blake3  # optional: much faster than SHA1, only used for equality checks
+except ImportError:
+    blake3 = None
+
 APP_NAME = "FiveM MLO Cleaner"
 APP_TAGLINE = "(Futuristic Dark Edition)"
 CREATED_BY = "created by Leutnant"
 
+UI_LOG_BATCH = 256      # worker sends UI log lines in blocks of this many...
+UI_LOG_INTERVAL = 0.25  # ...or at least this often (seconds)
+LOG_MAX_LINES = 10_000  # live log keeps the newest lines only, full log is in the logfile
+
 DEFAULT_KEEP_EXTS = {
     ".ymap", ".ytyp",
     ".ydr", ".ytd", ".yft", ".ycd", ".ynv", ".ypt",
@@ -20,25 +38,216 @@ DEFAULT_KEEP_EXTS = {
     ".meta",
     ".dat10", ".dat54", ".dat151",
 }
+_KEEP_EXTS = frozenset(sys.intern(x) for x in DEFAULT_KEEP_EXTS)
 
-def is_occlusion_name(p: Path) -> bool:
-    n = p.name.lower()
-    return ("occl" in n) or ("occlusion" in n)
+def is_occlusion_name(name_lower: str) -> bool:
+    return "occl" in name_lower  # also covers "occlusion"
 
-def sha1_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
-    h = hashlib.sha1()
-    with path.open("rb") as f:
-        while True:
-            b = f.read(chunk_size)
-            if not b:
-                break
-            h.update(b)
+# Files in flight at once. Pool threads sit in copy/hash calls with the GIL
+# released, so this is an I/O queue depth rather than a CPU count.
+IO_QUEUE_DEPTH = max(4, min(32, (os.cpu_count() or 1) * 4))
+
+MMAP_HASH_MIN = 1024 * 1024
+
+def _new_hasher():
+    if blake3 is None:
+        return hashlib.sha1()
+    return blake3.blake3(max_threads=blake3.blake3.AUTO)
+
+def digest_file(path: str | Path) -> str:
+    """
+    Content digest used for dedupe / identical-file checks (not security).
+    BLAKE3 if installed, otherwise SHA1.
+    Always a single update() call, no Python read loop: files from 1 MiB up
+    are mmap'ed, smaller ones are read in one go.
+    """
+    h = _new_hasher()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_HASH_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+        else:
+            h.update(f.read())
     return h.hexdigest()
 
-def iter_files(root: Path):
-    for dirpath, _, filenames in os.walk(root):
-        for fn in filenames:
-            yield Path(dirpath) / fn
+HEAD_BYTES = 64 * 1024
+
+def head_digest(path: str | Path, n: int = HEAD_BYTES) -> str:
+    with open(path, "rb") as f:
+        h = _new_hasher()
+        h.update(f.read(n))
+    return h.hexdigest()
+
+class DigestCache:
+    """
+    Per-job head / full digest memo keyed by path (a race at worst hashes twice).
+    """
+    def __init__(self):
+        self._heads: dict[str, str] = {}
+        self._digests: dict[str, str] = {}
+
+    def head_of(self, path: str) -> str:
+        if path not in self._heads:
+            self._heads[path] = head_digest(path)
+        return self._heads[path]
+
+    def digest_of(self, path: str) -> str:
+        if path not in self._digests:
+            self._digests[path] = digest_file(path)
+        return self._digests[path]
+
+    def same_content(self, path: str, other: str, size: int) -> bool:
+        """
+        Compares two files already known to have `size` bytes each.
+        Errors reading `path` raise; an unreadable `other` just isn't a match.
+        """
+        head = self.head_of(path)
+        try:
+            if self.head_of(other) != head:
+                return False
+        except OSError:
+            return False
+        # small files are fully covered by the head hash, no second read
+        if size <= HEAD_BYTES:
+            return True
+        digest = self.digest_of(path)
+        try:
+            return self.digest_of(other) == digest
+        except OSError:
+            return False
+
+    def prefetch(self, ex: concurrent.futures.Executor, groups: list[list[str]], size: dict[str, int],
+                 stop: threading.Event | None = None):
+        """
+        Hashes same-size groups on the pool: heads, then full digests where heads collide.
+        """
+        def _warm(fn, paths):
+            def one(p):
+                if stop is not None and stop.is_set():
+                    return
+                try:
+                    fn(p)
+                except OSError:
+                    pass
+            list(ex.map(one, paths))
+
+        groups = [g for g in groups if len(g) > 1]
+        _warm(self.head_of, [p for g in groups for p in g])
+
+        full = []
+        for g in groups:
+            if size[g[0]] <= HEAD_BYTES:
+                continue
+            by_head: dict[str, list[str]] = {}
+            for p in g:
+                if p in self._heads:
+                    by_head.setdefault(self._heads[p], []).append(p)
+            full += [p for hg in by_head.values() if len(hg) > 1 for p in hg]
+        _warm(self.digest_of, full)
+
+class DedupeIndex:
+    """
+    Duplicate lookup by (ext, size) -> 64 KiB head -> full digest; first file in scan order wins.
+    """
+    def __init__(self, entries: list[os.DirEntry], size: dict[str, int], cache: DigestCache):
+        self.cache = cache
+        self.by_sig: dict[tuple[str, int], list[str]] = {}
+        self._sigs: dict[str, tuple[str, int]] = {}
+        for e in entries:
+            if e.path not in size:
+                continue  # no size: see _CleanJob.run
+            sig = (os.path.splitext(e.name)[1].lower(), size[e.path])
+            self._sigs[e.path] = sig
+            self.by_sig.setdefault(sig, []).append(e.path)
+
+    def find_original(self, path: str) -> str | None:
+        """
+        Returns the earliest file with identical content, or None if
+        `path` is the first of its kind.
+        """
+        sig = self._sigs.get(path)
+        if sig is None:
+            return None
+        for p in self.by_sig[sig]:
+            if p == path:
+                return None
+            if self.cache.same_content(path, p, sig[1]):
+                return p
+        return None
+
+def is_same_content(src: str | Path, dst: str | Path, trust_mtime: bool) -> bool:
+    """
+    Different size -> different file. Same size + mtime counts as same only with
+    trust_mtime, i.e. when dst can only be a copy of src (no flattening).
+    """
+    src_st = os.stat(src)
+    dst_st = os.stat(dst)
+    if src_st.st_size != dst_st.st_size:
+        return False
+    if trust_mtime and src_st.st_mtime_ns == dst_st.st_mtime_ns:
+        return True
+    return digest_file(src) == digest_file(dst)
+
+def _copy_range(s, d, size: int):
+    off = 0
+    while off < size:
+        n = os.copy_file_range(s.fileno(), d.fileno(), size - off)
+        if n == 0:
+            break
+        off += n
+
+def _sendfile_copy(s, d, size: int):
+    # for kernels / filesystems that refuse copy_file_range (e.g. cross-device before 5.3)
+    remaining = size
+    while remaining:
+        sent = os.sendfile(d.fileno(), s.fileno(), None, remaining)
+        if not sent:
+            break
+        remaining -= sent
+
+def _fast_copy(src: str | Path, dst: str | Path):
+    """
+    copy2() replacement that keeps the bytes in the kernel:
+    copy_file_range, then sendfile on Linux (reflink on XFS/Btrfs),
+    CopyFileExW on Windows.
+    Anything else (or a filesystem that refuses both) falls back to shutil.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                size = os.fstat(s.fileno()).st_size
+                try:
+                    _copy_range(s, d, size)
+                except OSError:
+                    s.seek(0)
+                    d.seek(0)
+                    d.truncate()
+                    _sendfile_copy(s, d, size)
+        except OSError:
+            shutil.copyfile(src, dst)
+        shutil.copystat(src, dst)
+    elif os.name == "nt":
+        # also copies timestamps + attributes, like copy2
+        if not ctypes.windll.kernel32.CopyFileExW(str(src), str(dst), None, None, None, 0):
+            raise ctypes.WinError()
+    else:
+        shutil.copy2(src, dst)  # macOS: sendfile can't target files, copy2 uses fcopyfile
+
+def iter_files(root: str | Path):
+    """
+    Yields os.DirEntry for every file below root (symlinked dirs not followed,
+    unreadable dirs skipped). stat() is cached per entry; free only on Windows.
+    """
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from iter_files(e.path)
+            elif e.is_file():
+                yield e
 
 def write_fxmanifest(dest_root: Path, resource_name: str):
     content = f"""fx_version 'cerulean'
@@ -56,16 +265,12 @@ files {{
 """
     (dest_root / "fxmanifest.lua").write_text(content, encoding="utf-8")
 
-def should_keep_file(p: Path, keep_exts: set[str], include_ybn: bool):
+def should_keep_file(name_lower: str, ext: str, keep_exts: frozenset[str], include_ybn: bool):
     """
+    Takes an already lowercased file name and its extension.
     Returns (keep: bool, reason: str)
     """
-    if p.is_dir():
-        return False, "is_directory"
-
-    ext = p.suffix.lower()
-
-    if is_occlusion_name(p):
+    if is_occlusion_name(name_lower):
         return False, "occlusion_file_name"
 
     if ext == ".ybn" and not include_ybn:
@@ -75,20 +280,315 @@ def should_keep_file(p: Path, keep_exts: set[str], include_ybn: bool):
         return True, "kept"
     return False, f"extension_not_allowed:{ext or '<none>'}"
 
+@functools.lru_cache(maxsize=None)
+def keep_name_pattern(keep_exts: frozenset[str], include_ybn: bool) -> re.Pattern:
+    """
+    should_keep_file's "kept" answer as one compiled regex (one C call per name).
+    """
+    exts = set(keep_exts)
+    if include_ybn:
+        exts.add(".ybn")
+    alts = "|".join(re.escape(e) for e in sorted(exts))
+    return re.compile(rf"(?!.*occl).*[^.].*(?:{alts})\Z", re.IGNORECASE | re.DOTALL)
+
+def notify_log(master_tk: tk.Misc):
+    """
+    Wakes the UI to drain the log queue. Safe to call from worker threads
+    (Tcl marshals the event to the main thread).
+    """
+    try:
+        master_tk.event_generate("<<LogMsg>>", when="tail")
+    except (RuntimeError, tk.TclError):
+        pass  # window already closed
+
+class _CleanJob:
+    """
+    One clean_one run: names picked serially in scan order, copies on the pool,
+    results reported in scan order.
+    """
+    def __init__(self, worker: "CleanerWorker", resource_name: str, src: Path, dest_root: Path,
+                 stream_dir: Path, fresh_out: bool, flatten_stream: bool, dedupe: bool,
+                 total: int, skipped: int, progress_cb, progress_range):
+        self.worker = worker
+        self.logger = worker.logger
+        self.stop_event = worker.stop_event
+        self.resource_name = resource_name
+        self.src_str = os.fspath(src)
+        self.dest_root_str = os.fspath(dest_root)
+        self.stream_dir_str = os.fspath(stream_dir)
+        self.fresh_out = fresh_out
+        self.flatten_stream = flatten_stream
+        self.dedupe = dedupe
+        self.total = total
+        self.progress_cb = progress_cb
+        self.progress_range = progress_range
+
+        self.copied = 0
+        self.skipped = skipped
+        self.errors = 0
+        self.done = skipped
+        self.stopped = False
+
+        self.cache = DigestCache()
+        self.dedupe_index: DedupeIndex | None = None
+        self.size: dict[str, int] = {}
+        self.claimed: dict[str, str] = {}  # dest name (key) -> source path that took it
+        self.disk_same: dict[str, bool | Exception] = {}  # src path -> compare vs existing dest
+        self.existing: dict[str, str] = {}  # dest name (key) -> path already in stream/
+        self.created_dirs: set[str] = {self.stream_dir_str}  # one makedirs per parent, not per file
+        self.pending: collections.deque = collections.deque()  # results / futures, scan order
+
+    # Results are (status, ui_msg, log records); log records are
+    # (level, fmt, args, exc_info) and get written in scan order.
+
+    def run(self, kept: list[os.DirEntry]):
+        if not self.fresh_out:
+            # one walk instead of an lexists() per file, keyed like `claimed`
+            for root, dirs, names in os.walk(self.stream_dir_str):
+                for name in dirs + names:
+                    path = os.path.join(root, name)
+                    self.existing[self._key(path)] = path
+        for entry in kept:
+            try:
+                self.size[entry.path] = entry.stat().st_size
+            except OSError:
+                pass  # vanished; the copy will report it
+        dests = [self._dest_for(entry) for entry in kept]
+        if self.dedupe:
+            self.dedupe_index = DedupeIndex(kept, self.size, self.cache)
+
+        # copy + hash release the GIL, so the pool keeps several files in flight
+        with concurrent.futures.ThreadPoolExecutor(max_workers=IO_QUEUE_DEPTH) as ex:
+            self._prefetch(ex, kept, dests)
+
+            for entry, dest_path in zip(kept, dests):
+                if self.stop_event.is_set():
+                    if not self.stopped:
+                        self._stop()
+                    break
+                try:
+                    planned = self._plan_one(entry, dest_path)
+                except Exception as e:
+                    planned = self._error(entry, e, [])
+                if planned[0] == "COPY":
+                    self.pending.append(ex.submit(self._copy_one, entry, planned[1], planned[2]))
+                else:
+                    self.pending.append(planned)
+                self._drain(block=False)
+                self.worker.flush_ui_log_if_due()
+            self._drain(block=True)
+
+    def _dest_for(self, entry: os.DirEntry) -> str:
+        if self.flatten_stream:
+            return os.path.join(self.stream_dir_str, entry.name)
+        return os.path.join(self.stream_dir_str, os.path.relpath(entry.path, self.src_str))
+
+    @staticmethod
+    def _key(path: str) -> str:
+        # casefold'ed: Windows and macOS (APFS) names are case-insensitive,
+        # and a copy made here may be moved to one of those later
+        return os.path.normcase(path).casefold()
+
+    def _on_disk(self, path: str) -> str | None:
+        """
+        The file already in stream/ that path would collide with, if any.
+        """
+        return self.existing.get(self._key(path))
+
+    def _prefetch(self, ex: concurrent.futures.Executor, kept: list[os.DirEntry], dests: list[str]):
+        """
+        Does on the pool the hashing / disk compares the serial planning pass will need.
+        """
+        trust_mtime = not self.flatten_stream
+
+        def _compare(f: str, dest_path: str):
+            if self.stop_event.is_set():
+                return
+            try:
+                self.disk_same[f] = is_same_content(f, dest_path, trust_mtime=trust_mtime)
+            except Exception as e:
+                self.disk_same[f] = e
+
+        disk_futs = []
+        for entry, dest_path in zip(kept, dests):
+            on_disk = self._on_disk(dest_path)
+            if on_disk is not None:
+                disk_futs.append(ex.submit(_compare, entry.path, on_disk))
+
+        same_name: dict[tuple[str, int], list[str]] = {}
+        for entry, dest_path in zip(kept, dests):
+            if entry.path in self.size:
+                same_name.setdefault((self._key(dest_path), self.size[entry.path]), []).append(entry.path)
+        groups = list(same_name.values())
+        if self.dedupe_index is not None:
+            groups += self.dedupe_index.by_sig.values()
+        self.cache.prefetch(ex, groups, self.size, stop=self.stop_event)
+        concurrent.futures.wait(disk_futs)
+
+    def _plan_one(self, entry: os.DirEntry, dest_path: str):
+        """
+        Serial, scan order: dedupe + pick the dest name. Returns a result or ("COPY", dest, logs).
+        """
+        f = entry.path
+        name = entry.name
+        if self.dedupe_index is not None:
+            first = self.dedupe_index.find_original(f)
+            if first is not None:
+                return ("DEDUPED", f"[DEDUPED] {self.resource_name}: {name} (same as {os.path.basename(first)})",
+                        [(logging.INFO, "DEDUPED: %s | same_as=%s", (f, first), None)])
+
+        logs = []
+        owner = self.claimed.get(self._key(dest_path))
+        on_disk = self._on_disk(dest_path)
+        if owner is not None:
+            # taken by an earlier file of this job: compare the sources,
+            # its copy may not be finished yet
+            sz = self.size.get(f)
+            if sz is not None and self.size.get(owner) == sz and self.cache.same_content(f, owner, sz):
+                return ("SKIP-SAME", f"[SKIP-SAME] {self.resource_name}: {name}",
+                        [(logging.INFO, "SKIP-SAME: %s identical to %s", (f, owner), None)])
+        elif on_disk is not None:
+            same = self.disk_same.get(f)
+            if same is None:  # not prefetched (stop raced it)
+                try:
+                    same = is_same_content(f, on_disk, trust_mtime=not self.flatten_stream)
+                except Exception as e:
+                    same = e
+            if isinstance(same, Exception):
+                logs.append((logging.WARNING, "Hash compare failed for %s: %s", (f, same), None))
+            elif same:
+                # later same-name files of this job compare against f
+                self.claimed[self._key(dest_path)] = f
+                return ("SKIP-SAME", f"[SKIP-SAME] {self.resource_name}: {name}",
+                        [(logging.INFO, "SKIP-SAME: %s already identical", (f,), None)])
+        else:
+            self.claimed[self._key(dest_path)] = f
+            return "COPY", dest_path, logs
+
+        stem, ext = os.path.splitext(dest_path)
+        n = 2
+        while True:
+            alt = f"{stem}_{n}{ext}"
+            if self._key(alt) not in self.claimed:
+                on_disk = self._on_disk(alt)
+                if on_disk is None:
+                    break
+                # re-run: this may be our own renamed copy from last time
+                try:
+                    if is_same_content(f, on_disk, trust_mtime=False):
+                        self.claimed[self._key(alt)] = f
+                        return ("SKIP-SAME", f"[SKIP-SAME] {self.resource_name}: {name}",
+                                [(logging.INFO, "SKIP-SAME: %s already identical (%s)", (f, on_disk), None)])
+                except OSError:
+                    pass  # treat as taken
+            n += 1
+        dest_path = alt
+        self.claimed[self._key(dest_path)] = f
+        logs.append((logging.INFO, "NAME-CONFLICT: %s -> %s", (f, dest_path), None))
+        return "COPY", dest_path, logs
+
+    def _error(self, entry: os.DirEntry, e: Exception, logs: list):
+        return ("ERROR", f"[ERROR] {self.resource_name}: {entry.name} | {e}",
+                logs + [(logging.ERROR, "ERROR copying %s: %s", (entry.path, e), e)])
+
+    def _copy_one(self, entry: os.DirEntry, dest_path: str, logs: list):
+        """
+        Runs on a pool thread; the name is already reserved.
+        """
+        if self.stop_event.is_set():
+            return "STOPPED", None, logs
+        try:
+            parent = os.path.dirname(dest_path)
+            if parent not in self.created_dirs:
+                os.makedirs(parent, exist_ok=True)
+                self.created_dirs.add(parent)
+
+            _fast_copy(entry.path, dest_path)
+        except Exception as e:
+            return self._error(entry, e, logs)
+        rel = os.path.relpath(dest_path, self.dest_root_str)
+        return ("COPY", f"[COPY] {self.resource_name}: {entry.name} -> {rel}",
+                logs + [(logging.INFO, "COPY: %s -> %s", (entry.path, dest_path), None)])
+
+    def _emit(self, result):
+        status, msg, logs = result
+        for level, fmt, args, exc in logs:
+            self.logger.log(level, fmt, *args, exc_info=exc)
+        if status == "COPY":
+            self.copied += 1
+        elif status == "ERROR":
+            self.errors += 1
+        elif status != "STOPPED":
+            self.skipped += 1
+        if msg:
+            self.worker.ui_log(msg)
+        self.done += 1
+        self.worker._update_progress(self.progress_cb, self.done, self.total, self.progress_range)
+
+    def _stop(self):
+        self.stopped = True
+        self.worker.ui_log("!! STOP requested. Aborting current job.")
+        self.logger.warning("STOP requested. Aborting job: %s", self.resource_name)
+        for item in self.pending:
+            if isinstance(item, concurrent.futures.Future):
+                item.cancel()
+        self.pending.clear()
+
+    def _drain(self, block: bool):
+        while self.pending and not self.stopped:
+            if self.stop_event.is_set():
+                self._stop()
+                return
+            head = self.pending[0]
+            if isinstance(head, concurrent.futures.Future):
+                if not block and not head.done():
+                    return
+                # long copies: keep buffered lines moving while we wait
+                done_now, _ = concurrent.futures.wait(
+                    [head], timeout=UI_LOG_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done_now:
+                    self.worker.flush_ui_log()
+                    continue
+                head = head.result()
+            self.pending.popleft()
+            self._emit(head)
+
 class CleanerWorker:
-    def __init__(self, log_q: queue.Queue, stop_event: threading.Event, logger: logging.Logger):
+    def __init__(self, log_q: queue.Queue, stop_event: threading.Event, logger: logging.Logger,
+                 master_tk: tk.Misc | None = None):
         self.log_q = log_q
         self.stop_event = stop_event
         self.logger = logger
+        self.master_tk = master_tk
+        self._ui_buf: list[str] = []
+        self._ui_flushed = time.monotonic()
 
     def ui_log(self, msg: str):
-        self.log_q.put(msg)
+        # buffered: one queue item / one UI wakeup per block of messages
+        self._ui_buf.append(msg)
+        if len(self._ui_buf) >= UI_LOG_BATCH:
+            self.flush_ui_log()
+        else:
+            self.flush_ui_log_if_due()
+
+    def flush_ui_log_if_due(self):
+        if self._ui_buf and time.monotonic() - self._ui_flushed >= UI_LOG_INTERVAL:
+            self.flush_ui_log()
+
+    def flush_ui_log(self):
+        self._ui_flushed = time.monotonic()
+        if not self._ui_buf:
+            return
+        self.log_q.put("\n".join(self._ui_buf))
+        self._ui_buf.clear()
+        if self.master_tk is not None:
+            notify_log(self.master_tk)
 
     def clean_one(
         self,
         src: Path,
         out_dir: Path,
-        keep_exts: set[str],
+        keep_exts: frozenset[str],
         include_ybn: bool,
         make_fxmanifest: bool,
         flatten_stream: bool,
@@ -103,6 +603,8 @@ class CleanerWorker:
         resource_name = src.name
         dest_root = out_dir / f"{resource_name}_fivem_clean"
         stream_dir = dest_root / "stream"
+        # nothing can be in a brand-new stream/ except what this job writes
+        fresh_out = not stream_dir.exists()
         stream_dir.mkdir(parents=True, exist_ok=True)
 
         if make_fxmanifest:
@@ -111,11 +613,7 @@ class CleanerWorker:
         files = list(iter_files(src))
         total = max(1, len(files))
 
-        copied = 0
         skipped = 0
-        errors = 0
-
-        seen_hashes: dict[str, Path] = {}
 
         self.ui_log(f"\n=== START: {resource_name} ===")
         self.ui_log(f"Scanning: {src}")
@@ -124,73 +622,32 @@ class CleanerWorker:
         self.logger.info("Options: include_ybn=%s make_fxmanifest=%s flatten_stream=%s dedupe=%s",
                          include_ybn, make_fxmanifest, flatten_stream, dedupe)
 
-        for i, f in enumerate(files, start=1):
-            if self.stop_event.is_set():
-                self.ui_log("!! STOP requested. Aborting current job.")
-                self.logger.warning("STOP requested. Aborting job: %s", resource_name)
-                break
-
-            keep, reason = should_keep_file(f, keep_exts, include_ybn)
+        keep_re = keep_name_pattern(keep_exts, include_ybn)
+        kept: list[os.DirEntry] = []
+        for entry in files:
+            if keep_re.match(entry.name):
+                kept.append(entry)
+                continue
+            # skipped: work out the reason for the logfile
+            name_lower = entry.name.lower()
+            ext = os.path.splitext(name_lower)[1]
+            keep, reason = should_keep_file(name_lower, ext, keep_exts, include_ybn)
             if not keep:
                 skipped += 1
-                self.logger.debug("SKIP: %s | reason=%s", f, reason)
-                self._update_progress(progress_cb, i, total, progress_range)
+                self.logger.debug("SKIP: %s | reason=%s", entry.path, reason)
                 continue
+            kept.append(entry)  # regex and should_keep_file disagree; trust the latter
 
-            try:
-                if flatten_stream:
-                    dest_path = stream_dir / f.name
-                else:
-                    rel = f.relative_to(src)
-                    dest_path = stream_dir / rel
-
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-                if dedupe:
-                    h = sha1_file(f)
-                    if h in seen_hashes:
-                        skipped += 1
-                        self.ui_log(f"[DEDUPED] {resource_name}: {f.name} (same as {seen_hashes[h].name})")
-                        self.logger.info("DEDUPED: %s | same_as=%s", f, seen_hashes[h])
-                        self._update_progress(progress_cb, i, total, progress_range)
-                        continue
-                    seen_hashes[h] = dest_path
-
-                if dest_path.exists():
-                    try:
-                        if sha1_file(dest_path) == sha1_file(f):
-                            skipped += 1
-                            self.ui_log(f"[SKIP-SAME] {resource_name}: {f.name}")
-                            self.logger.info("SKIP-SAME: %s already identical", f)
-                            self._update_progress(progress_cb, i, total, progress_range)
-                            continue
-                    except Exception as e:
-                        self.logger.warning("Hash compare failed for %s: %s", f, e)
-
-                    stem, ext = dest_path.stem, dest_path.suffix
-                    n = 2
-                    while True:
-                        alt = dest_path.with_name(f"{stem}_{n}{ext}")
-                        if not alt.exists():
-                            dest_path = alt
-                            break
-                        n += 1
-                    self.logger.info("NAME-CONFLICT: %s -> %s", f, dest_path)
-
-                shutil.copy2(f, dest_path)
-                copied += 1
-                self.ui_log(f"[COPY] {resource_name}: {f.name} -> {dest_path.relative_to(dest_root)}")
-                self.logger.info("COPY: %s -> %s", f, dest_path)
-
-            except Exception as e:
-                errors += 1
-                self.ui_log(f"[ERROR] {resource_name}: {f.name} | {e}")
-                self.logger.exception("ERROR copying %s: %s", f, e)
+        self.flush_ui_log()  # START lines out before any hashing
 
-            self._update_progress(progress_cb, i, total, progress_range)
+        job = _CleanJob(self, resource_name, src, dest_root, stream_dir, fresh_out, flatten_stream,
+                        dedupe, total, skipped, progress_cb, progress_range)
+        job.run(kept)
+        copied, skipped, errors = job.copied, job.skipped, job.errors
 
         self.ui_log(f"=== DONE: {resource_name} | Copied: {copied} | Skipped: {skipped} | Errors: {errors} ===")
         self.logger.info("DONE %s | copied=%d skipped=%d errors=%d", resource_name, copied, skipped, errors)
+        self.flush_ui_log()
         return copied, skipped, errors, dest_root
 
     def _update_progress(self, progress_cb, i, total, progress_range):
@@ -206,6 +663,11 @@ class CleanerWorker:
 # ----------------- Futuristic Fire Progress Bar -----------------
 
 class FireBar(ttk.Frame):
+    _STRIPE_COLORS = tuple(
+        "#ff3b2f" if s < 18*0.55 else "#ffb300" if s < 18*0.85 else "#fff2a6"
+        for s in range(18)
+    )
+
     def __init__(self, master, width=760, height=24, **kwargs):
         super().__init__(master, **kwargs)
         self.w = width
@@ -213,6 +675,10 @@ class FireBar(ttk.Frame):
         self.value = 0
         self.maximum = 100
         self._t = 0.0
+        self._last_value = None
+        self._stripe_ids: list[int] = []
+        self._ember_ids: list[int] = []
+        self._fill_shown = False
 
         self.canvas = tk.Canvas(self, width=self.w, height=self.h, highlightthickness=0, bd=0)
         self.canvas.pack(fill="x", expand=True)
@@ -235,21 +701,32 @@ class FireBar(ttk.Frame):
         self.canvas.create_text(10, self.h/2, text="🔥", fill=self._text, anchor="w",
                                 font=("Segoe UI Emoji", 11), tags=("flame",))
 
+        # fire items are created once (hidden) and only moved in _render
+        self._stripe_ids = [
+            self.canvas.create_rectangle(0, 0, 0, 0, outline="", fill=col, state="hidden", tags=("fill",))
+            for col in self._STRIPE_COLORS
+        ]
+        self._ember_ids = [
+            self.canvas.create_oval(0, 0, 0, 0, outline="", fill="#ff6a00", state="hidden", tags=("embers",))
+            for _ in range(10)
+        ]
+        self._fill_shown = False
+
     def set(self, value, maximum=None):
         if maximum is not None and maximum > 0:
             self.maximum = maximum
         self.value = max(0, min(value, self.maximum))
 
     def _animate(self):
-        self._t += 0.12
-        self._render()
+        # nothing moves on an empty bar, nothing is seen while minimized
+        frozen = self.value == self._last_value
+        if not (frozen and (self.value <= 0 or not self.winfo_viewable())):
+            self._t += 0.12
+            self._render()
+            self._last_value = self.value
         self.after(40, self._animate)
 
     def _render(self):
-        import math
-        self.canvas.delete("fill")
-        self.canvas.delete("embers")
-
         inner_w = self.w - 8
         inner_h = self.h - 8
         x0, y0 = 4, 4
@@ -257,26 +734,24 @@ class FireBar(ttk.Frame):
         frac = 0 if self.maximum <= 0 else (self.value / self.maximum)
         fill_w = int(inner_w * frac)
 
-        stripes = 18
         if fill_w > 0:
-            for s in range(stripes):
+            stripes = len(self._stripe_ids)
+            for s, item in enumerate(self._stripe_ids):
                 sx0 = x0 + int(fill_w * s / stripes)
                 sx1 = x0 + int(fill_w * (s+1) / stripes)
                 flick = int(1 + 2 * (0.5 + 0.5 * (1 + math.sin(self._t + s*0.6))))
-                if s < stripes*0.55:
-                    col = "#ff3b2f"
-                elif s < stripes*0.85:
-                    col = "#ffb300"
-                else:
-                    col = "#fff2a6"
-                self.canvas.create_rectangle(sx0, y0+flick, sx1, y0+inner_h-flick,
-                                             outline="", fill=col, tags=("fill",))
+                self.canvas.coords(item, sx0, y0+flick, sx1, y0+inner_h-flick)
 
             end_x = x0 + fill_w
-            for k in range(10):
+            for k, item in enumerate(self._ember_ids):
                 dy = int((k * 7 + int(8 * math.sin(self._t + k))) % inner_h)
-                self.canvas.create_oval(end_x-6, y0+dy, end_x-2, y0+dy+4,
-                                        outline="", fill="#ff6a00", tags=("embers",))
+                self.canvas.coords(item, end_x-6, y0+dy, end_x-2, y0+dy+4)
+
+        if (fill_w > 0) != self._fill_shown:
+            self._fill_shown = fill_w > 0
+            state = "normal" if self._fill_shown else "hidden"
+            self.canvas.itemconfigure("fill", state=state)
+            self.canvas.itemconfigure("embers", state=state)
 
         pct = int(frac * 100)
         self.canvas.itemconfigure("pct", text=f"{pct}%")
@@ -331,7 +806,7 @@ class App(tk.Tk):
 
         self._style_ttk()
         self._build_ui()
-        self.after(80, self._drain_log_queue)
+        self.bind("<<LogMsg>>", lambda e: self._drain_log_queue())
 
     def _style_ttk(self):
         style = ttk.Style(self)
@@ -409,7 +884,7 @@ class App(tk.Tk):
         ttk.Checkbutton(opt_row, text="Keep .ybn collision (NOT recommended)", variable=self.include_ybn).pack(side="left", padx=(0, 16))
         ttk.Checkbutton(opt_row, text="Create fxmanifest.lua", variable=self.make_fxmanifest).pack(side="left", padx=(0, 16))
         ttk.Checkbutton(opt_row, text="Flatten into stream/", variable=self.flatten_stream).pack(side="left", padx=(0, 16))
-        ttk.Checkbutton(opt_row, text="Dedupe identical files (SHA1)", variable=self.dedupe).pack(side="left")
+        ttk.Checkbutton(opt_row, text="Dedupe identical files (BLAKE3/SHA1)", variable=self.dedupe).pack(side="left")
 
         paths.columnconfigure(1, weight=1)
 
@@ -486,14 +961,24 @@ class App(tk.Tk):
             messagebox.showinfo("Output", f"Output folder: {out}")
 
     def _drain_log_queue(self):
+        # one insert + one see() per drain; per-message inserts re-render every time
+        msgs = []
         try:
             while True:
-                msg = self.log_q.get_nowait()
-                self.log_text.insert("end", msg + "\n")
-                self.log_text.see("end")
+                msgs.append(self.log_q.get_nowait())
         except queue.Empty:
             pass
-        self.after(80, self._drain_log_queue)
+        if msgs:
+            self.log_text.insert("end", "\n".join(msgs) + "\n")
+            # text ends with "\n", so "end-1c" sits on the empty line after the last one
+            last = int(self.log_text.index("end-1c").split(".")[0])
+            if last - 1 > LOG_MAX_LINES:
+                self.log_text.delete("1.0", f"{last - LOG_MAX_LINES}.0")
+            self.log_text.see("end")
+
+    def ui_log(self, msg: str):
+        self.log_q.put(msg)
+        notify_log(self)
 
     def _progress(self, current: int, total: int):
         if total <= 0:
@@ -514,11 +999,14 @@ class App(tk.Tk):
         fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
         fh.setFormatter(fmt)
 
+        # buffer records, write them in blocks (warnings/errors go out at once)
+        mh = logging.handlers.MemoryHandler(capacity=512, flushLevel=logging.WARNING, target=fh)
+
         logger.handlers.clear()
-        logger.addHandler(fh)
+        logger.addHandler(mh)
 
         self.logger = logger
-        self.log_q.put(f"[LOGFILE] {self.logfile_path}")
+        self.ui_log(f"[LOGFILE] {self.logfile_path}")
 
     def start(self):
         if not self.sources:
@@ -539,27 +1027,28 @@ class App(tk.Tk):
         self.stop_btn.config(state="normal")
         self.firebar.set(0, 100)
 
-        self.log_q.put("Starting queue…")
+        self.ui_log("Starting queue…")
 
         def run_queue():
+            worker = None
             try:
-                worker = CleanerWorker(self.log_q, self.stop_event, self.logger)
+                worker = CleanerWorker(self.log_q, self.stop_event, self.logger, master_tk=self)
 
                 n = len(self.sources)
                 for idx, src in enumerate(self.sources, start=1):
                     if self.stop_event.is_set():
-                        self.log_q.put("Queue stopped.")
+                        self.ui_log("Queue stopped.")
                         break
 
                     # global progress chunk per job
                     start = int(((idx - 1) / n) * 100)
                     end = int((idx / n) * 100)
 
-                    self.log_q.put(f"\n>>> Job {idx}/{n}: {src.name}")
+                    self.ui_log(f"\n>>> Job {idx}/{n}: {src.name}")
                     worker.clean_one(
                         src=src,
                         out_dir=out_p,
-                        keep_exts=set(DEFAULT_KEEP_EXTS),
+                        keep_exts=_KEEP_EXTS,
                         include_ybn=self.include_ybn.get(),
                         make_fxmanifest=self.make_fxmanifest.get(),
                         flatten_stream=self.flatten_stream.get(),
@@ -568,12 +1057,17 @@ class App(tk.Tk):
                         progress_range=(start, end),
                     )
 
-                self.log_q.put("\nAll done.")
+                self.ui_log("\nAll done.")
             except Exception as e:
-                self.log_q.put(f"FATAL ERROR: {e}")
+                if worker:
+                    worker.flush_ui_log()
+                self.ui_log(f"FATAL ERROR: {e}")
                 if self.logger:
                     self.logger.exception("Fatal error: %s", e)
             finally:
+                if self.logger:
+                    for h in self.logger.handlers:
+                        h.flush()
                 self.start_btn.config(state="normal")
                 self.stop_btn.config(state="disabled")
 
@@ -582,11 +1076,10 @@ class App(tk.Tk):
 
     def stop(self):
         self.stop_event.set()
-        self.log_q.put("Stop requested…")
+        self.ui_log("Stop requested…")
 
 if __name__ == "__main__":
     try:
-        import ctypes
         ctypes.windll.shcore.SetProcessDpiAwareness(1)
     except Exception:
         pass